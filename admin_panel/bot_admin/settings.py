@@ -10,11 +10,24 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.0/ref/settings/
 """
 
+import os
+import sys
 from pathlib import Path
 
 # Build paths inside the project like this: BASE_DIR / 'subdir'.
 BASE_DIR = Path(__file__).resolve().parent.parent
 
+# The shared data-access package lives next to admin_panel/ and bot/
+sys.path.insert(0, str(BASE_DIR.parent))
+
+from django.core.exceptions import ImproperlyConfigured  # noqa: E402
+
+from shared.config import load_env  # noqa: E402
+from shared.db import database_config  # noqa: E402
+
+# Read the bot's .env so both processes see the same DB_* settings
+load_env()
+
 
 # Quick-start development settings - unsuitable for production
 # See https://docs.djangoproject.com/en/4.0/howto/deployment/checklist/
@@ -76,12 +89,47 @@ WSGI_APPLICATION = 'bot_admin.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.0/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# The bot and the admin panel share one PostgreSQL database configured through
+# the same DB_* variables (from the environment or the bot's .env). SQLite is
+# never picked implicitly: set DB_ENGINE=sqlite for local development and
+# tests, e.g. `DB_ENGINE=sqlite python manage.py test`.
+
+DB_ENGINE = os.getenv('DB_ENGINE', 'postgresql')
+
+if DB_ENGINE == 'postgresql':
+    _db = database_config()
+    if not _db['dbname']:
+        raise ImproperlyConfigured(
+            "DB_NAME is not set in the environment or the bot's .env file; "
+            "set DB_ENGINE=sqlite to use a local SQLite database instead."
+        )
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': _db['dbname'],
+            'USER': _db['user'],
+            'PASSWORD': _db['password'],
+            'HOST': _db['host'],
+            'PORT': _db['port'],
+        }
+    }
+elif DB_ENGINE == 'sqlite':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': BASE_DIR / 'db.sqlite3',
+        }
     }
-}
+else:
+    raise ImproperlyConfigured(f"Unknown DB_ENGINE {DB_ENGINE!r}: expected 'postgresql' or 'sqlite'.")
+
+
+# Message history retention (see dashboard/retention.py and the
+# compact_messages management command)
+
+MESSAGE_RETENTION_DAYS = int(os.getenv('MESSAGE_RETENTION_DAYS', 180))
+
+MESSAGE_ARCHIVE_DIR = Path(os.getenv('MESSAGE_ARCHIVE_DIR', BASE_DIR / 'archive'))
 
 
 # Password validation
@@ -1,12 +1,13 @@
 ﻿# admin_panel/dashboard/admin.py
 
 from django.contrib import admin
-from .models import User, Message, UserStatistic
+from django.db import models
+from .models import User, Message, UserStatistic, BotText
 from django.urls import path
 from django.shortcuts import redirect
 from django.template.response import TemplateResponse
-from django.utils import timezone
-from datetime import datetime
+
+from shared.dates import day_bounds, day_clock
 
 @admin.register(User)
 class UserAdmin(admin.ModelAdmin):
@@ -34,14 +35,33 @@ class UserAdmin(admin.ModelAdmin):
 @admin.register(Message)
 class MessageAdmin(admin.ModelAdmin):
     list_display = ('id', 'user', 'role', 'timestamp')
-    search_fields = ('user__telegram_id', 'user__username', 'content')
+    search_fields = ('user__telegram_id', 'user__username', 'content', 'text__content')
     list_filter = ('role', 'timestamp')
 
+@admin.register(BotText)
+class BotTextAdmin(admin.ModelAdmin):
+    list_display = ('id', 'key', 'digest')
+    search_fields = ('key', 'content')
+
+    # На тексты ссылаются отправленные сообщения, поэтому их можно только просматривать
+    def has_add_permission(self, request):
+        return False
+
+    def has_change_permission(self, request, obj=None):
+        return False
+
+    def has_delete_permission(self, request, obj=None):
+        return False
+
 @admin.register(UserStatistic)
 class UserStatisticAdmin(admin.ModelAdmin):
     list_display = ('date', 'user_count', 'command_count', 'message_count')
     search_fields = ('date',)
 
+def count_new_users(day):
+    start, end = day_bounds(day)
+    return User.objects.filter(start_date__gte=start, start_date__lt=end).count()
+
 # Создание пользовательского AdminSite для статистики
 class DashboardAdminSite(admin.AdminSite):
     site_header = 'Evrika Административная Панель'
@@ -59,8 +79,8 @@ class DashboardAdminSite(admin.AdminSite):
             return redirect('admin:index')
 
         total_users = User.objects.count()
-        today = timezone.now().date()
-        today_new_users = User.objects.filter(start_date__date=today).count()
+        # Сутки считаются по московскому времени, как и в счётчиках бота
+        today_new_users = count_new_users(day_clock.today())
         total_commands = UserStatistic.objects.aggregate(models.Sum('command_count'))['command_count__sum'] or 0
         total_messages = UserStatistic.objects.aggregate(models.Sum('message_count'))['message_count__sum'] or 0
         user_stats = UserStatistic.objects.all().order_by('date')
@@ -81,3 +101,4 @@ admin_site = DashboardAdminSite(name='dashboard')
 admin_site.register(User, UserAdmin)
 admin_site.register(Message, MessageAdmin)
 admin_site.register(UserStatistic, UserStatisticAdmin)
+admin_site.register(BotText, BotTextAdmin)
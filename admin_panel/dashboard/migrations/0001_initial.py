@@ -0,0 +1,68 @@
+# Generated by Django 4.0.6 on 2026-10-19 12:39
+
+# The bot created the users, messages and user_statistics tables by hand before
+# they were managed by Django. On such an existing database apply this migration
+# with `python manage.py migrate --fake-initial`: Django then records it as
+# applied when the tables already exist instead of failing on CREATE TABLE.
+# --fake-initial only checks that the tables exist, not their columns. Before
+# faking, compare the live tables with
+# `python manage.py inspectdb users messages user_statistics`: the columns must
+# match shared/schema.TABLES, and user_statistics.date must be unique, because
+# the bot's statistics upsert relies on ON CONFLICT (date).
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='User',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('telegram_id', models.BigIntegerField(unique=True)),
+                ('username', models.CharField(blank=True, max_length=255, null=True)),
+                ('first_name', models.CharField(max_length=255)),
+                ('last_name', models.CharField(blank=True, max_length=255, null=True)),
+                ('last_subject', models.CharField(blank=True, max_length=255, null=True)),
+                ('is_paid', models.BooleanField(default=False)),
+                ('is_banned', models.BooleanField(default=False)),
+                ('start_date', models.DateTimeField(auto_now_add=True)),
+            ],
+            options={
+                'db_table': 'users',
+            },
+        ),
+        migrations.CreateModel(
+            name='UserStatistic',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('date', models.DateField(unique=True)),
+                ('user_count', models.IntegerField(default=0)),
+                ('command_count', models.IntegerField(default=0)),
+                ('message_count', models.IntegerField(default=0)),
+            ],
+            options={
+                'db_table': 'user_statistics',
+            },
+        ),
+        migrations.CreateModel(
+            name='Message',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('role', models.CharField(choices=[('user', 'Пользователь'), ('bot', 'Бот')], max_length=10)),
+                ('content', models.TextField()),
+                ('timestamp', models.DateTimeField(auto_now_add=True)),
+                ('user', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='messages', to='dashboard.user')),
+            ],
+            options={
+                'db_table': 'messages',
+            },
+        ),
+    ]
@@ -0,0 +1,36 @@
+import hashlib
+
+from django.db import migrations, models
+
+
+def fill_digests(apps, schema_editor):
+    BotText = apps.get_model('dashboard', 'BotText')
+    for text in BotText.objects.all():
+        text.digest = hashlib.sha256(text.content.encode('utf-8')).hexdigest()
+        text.save(update_fields=['digest'])
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('dashboard', '0002_bot_texts'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='bottext',
+            name='key',
+            field=models.CharField(max_length=64),
+        ),
+        migrations.AddField(
+            model_name='bottext',
+            name='digest',
+            field=models.CharField(max_length=64, null=True),
+        ),
+        migrations.RunPython(fill_digests, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='bottext',
+            name='digest',
+            field=models.CharField(max_length=64, unique=True),
+        ),
+    ]
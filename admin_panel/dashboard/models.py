@@ -2,6 +2,9 @@
 
 from django.db import models
 
+from shared import schema
+from shared.texts import text_digest
+
 class User(models.Model):
     telegram_id = models.BigIntegerField(unique=True)
     username = models.CharField(max_length=255, null=True, blank=True)
@@ -12,9 +15,30 @@ class User(models.Model):
     is_banned = models.BooleanField(default=False)
     start_date = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        db_table = schema.USERS_TABLE
+
     def __str__(self):
         return f"{self.first_name} {self.last_name or ''} (@{self.username or 'NoUsername'})"
 
+class BotText(models.Model):
+    # Строка неизменяема: на неё ссылаются уже отправленные сообщения, поэтому
+    # новая редакция текста с тем же key сохраняется отдельной строкой
+    key = models.CharField(max_length=64)
+    digest = models.CharField(max_length=64, unique=True)
+    content = models.TextField()
+
+    class Meta:
+        db_table = schema.BOT_TEXTS_TABLE
+
+    def save(self, *args, **kwargs):
+        if not self.digest:
+            self.digest = text_digest(self.content)
+        super().save(*args, **kwargs)
+
+    def __str__(self):
+        return self.key
+
 class Message(models.Model):
     ROLE_CHOICES = (
         ('user', 'Пользователь'),
@@ -23,9 +47,18 @@ class Message(models.Model):
 
     user = models.ForeignKey(User, on_delete=models.CASCADE, related_name='messages')
     role = models.CharField(max_length=10, choices=ROLE_CHOICES)
-    content = models.TextField()
+    content = models.TextField(blank=True)
+    # Статический текст бота хранится один раз, сообщение ссылается на него
+    text = models.ForeignKey(BotText, on_delete=models.PROTECT, null=True, blank=True, related_name='messages')
     timestamp = models.DateTimeField(auto_now_add=True)
 
+    class Meta:
+        db_table = schema.MESSAGES_TABLE
+
+    @property
+    def full_content(self):
+        return self.text.content if self.text_id else self.content
+
     def __str__(self):
         return f"{self.role.capitalize()} в {self.timestamp.strftime('%Y-%m-%d %H:%M:%S')}"
 
@@ -35,5 +68,8 @@ class UserStatistic(models.Model):
     command_count = models.IntegerField(default=0)
     message_count = models.IntegerField(default=0)
 
+    class Meta:
+        db_table = schema.STATISTICS_TABLE
+
     def __str__(self):
         return f"{self.date}: {self.user_count} новых пользователей, {self.command_count} команд, {self.message_count} сообщений"
@@ -0,0 +1,204 @@
+# admin_panel/dashboard/retention.py
+#
+# Хранение истории сообщений: дедупликация статических текстов бота, перенос
+# старых сообщений в сжатые архивные файлы и удаление их из базы небольшими
+# порциями, чтобы не держать долгих блокировок. Порции выбираются по
+# первичному ключу (id > последнего обработанного), поэтому каждая следующая
+# не просматривает заново уже обработанную часть таблицы.
+
+import gzip
+import json
+import os
+import time
+import uuid
+from contextlib import contextmanager
+from datetime import timedelta
+from pathlib import Path
+
+from django.conf import settings
+from django.db import connection, transaction
+from django.db.models.functions import Length
+from django.db.models import Sum
+from django.utils import timezone
+
+from shared.texts import STATIC_TEXTS, text_digest
+
+from .models import BotText, Message
+
+DEFAULT_BATCH_SIZE = 1000
+# Ключ pg_advisory_lock, не дающий двум запускам обслуживания идти одновременно
+RETENTION_LOCK_ID = 0x6d657373
+
+
+def sync_bot_texts():
+    """Добавляет в bot_texts недостающие тексты из shared/texts.py, не изменяя существующие."""
+    texts = []
+    for key, content in STATIC_TEXTS.items():
+        text, _ = BotText.objects.get_or_create(
+            digest=text_digest(content), defaults={'key': key, 'content': content}
+        )
+        texts.append(text)
+    return texts
+
+
+def _content_length(queryset):
+    return queryset.aggregate(total=Sum(Length('content')))['total'] or 0
+
+
+def deduplicate_texts(batch_size=DEFAULT_BATCH_SIZE):
+    """Заменяет полные копии статических текстов ссылками на bot_texts."""
+    rows = 0
+    reclaimed = 0
+    for text in sync_bot_texts():
+        pending = Message.objects.filter(role='bot', text__isnull=True, content=text.content)
+        last_id = 0
+        while True:
+            ids = list(pending.filter(id__gt=last_id).order_by('id').values_list('id', flat=True)[:batch_size])
+            if not ids:
+                break
+            last_id = ids[-1]
+            with transaction.atomic():
+                Message.objects.filter(id__in=ids).update(text=text, content='')
+            rows += len(ids)
+            reclaimed += len(ids) * len(text.content)
+    return rows, reclaimed
+
+
+def _serialize(message):
+    return {
+        'id': message['id'],
+        'user_id': message['user_id'],
+        'role': message['role'],
+        'content': message['text__content'] if message['text_id'] else message['content'],
+        'timestamp': message['timestamp'].isoformat(),
+    }
+
+
+def archive_messages(days, archive_dir, batch_size=DEFAULT_BATCH_SIZE):
+    """
+    Переносит сообщения старше days дней в gzip-файл с JSON-строками и удаляет
+    их из базы. Каждая порция пишется в файл до удаления, поэтому при сбое
+    сообщения могут попасть в архив повторно, но не потеряются.
+    """
+    cutoff = timezone.now() - timedelta(days=days)
+    expired = Message.objects.filter(timestamp__lt=cutoff)
+    reclaimed = _content_length(expired)
+
+    archive_dir = Path(archive_dir)
+    archive_dir.mkdir(parents=True, exist_ok=True)
+    # Имя уникально и для запусков в одну и ту же секунду, а режим 'x' не даёт
+    # перезаписать архив, строки которого уже удалены из базы
+    suffix = f"{os.getpid()}-{uuid.uuid4().hex[:8]}"
+    path = archive_dir / f"messages-{timezone.now().strftime('%Y%m%d-%H%M%S')}-{suffix}.jsonl.gz"
+
+    rows = 0
+    last_id = 0
+    fields = ('id', 'user_id', 'role', 'content', 'text_id', 'text__content', 'timestamp')
+    with gzip.open(path, 'xt', encoding='utf-8') as archive:
+        while True:
+            batch = list(expired.filter(id__gt=last_id).order_by('id').values(*fields)[:batch_size])
+            if not batch:
+                break
+            last_id = batch[-1]['id']
+            for message in batch:
+                archive.write(json.dumps(_serialize(message), ensure_ascii=False) + '\n')
+            archive.flush()
+            with transaction.atomic():
+                Message.objects.filter(id__in=[message['id'] for message in batch]).delete()
+            rows += len(batch)
+
+    if not rows:
+        path.unlink()
+        path = None
+    return rows, reclaimed, path
+
+
+@contextmanager
+def retention_lock():
+    """
+    Сессионная advisory-блокировка PostgreSQL на время обслуживания. Отдаёт
+    False, если блокировку держит другой запуск. В SQLite блокировки нет.
+    """
+    if connection.vendor != 'postgresql':
+        yield True
+        return
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_try_advisory_lock(%s);", (RETENTION_LOCK_ID,))
+        acquired = cursor.fetchone()[0]
+    try:
+        yield acquired
+    finally:
+        if acquired:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT pg_advisory_unlock(%s);", (RETENTION_LOCK_ID,))
+
+
+def measure_latency(repeat=5):
+    """Медиана времени типичных запросов админки к messages, в миллисекундах."""
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        Message.objects.count()
+        list(Message.objects.order_by('-timestamp')[:100])
+        timings.append((time.perf_counter() - started) * 1000)
+    timings.sort()
+    return timings[len(timings) // 2]
+
+
+def table_size():
+    """Размер таблицы messages с индексами в байтах (только для PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT pg_total_relation_size(%s);", (Message._meta.db_table,))
+        return cursor.fetchone()[0]
+
+
+def dead_rows():
+    """Оценка мёртвых строк messages по pg_stat_user_tables (только для PostgreSQL)."""
+    if connection.vendor != 'postgresql':
+        return None
+    with connection.cursor() as cursor:
+        cursor.execute("SELECT n_dead_tup FROM pg_stat_user_tables WHERE relname = %s;",
+                       (Message._meta.db_table,))
+        row = cursor.fetchone()
+        return row[0] if row else None
+
+
+def vacuum():
+    # Обычный VACUUM не блокирует запись, но не возвращает место ОС: он лишь
+    # помечает место мёртвых строк как свободное для новых записей, поэтому
+    # размер файла таблицы после него почти не меняется
+    if connection.vendor == 'postgresql':
+        with connection.cursor() as cursor:
+            cursor.execute(f"VACUUM ANALYZE {Message._meta.db_table};")
+
+
+def run_retention(days=None, archive_dir=None, batch_size=DEFAULT_BATCH_SIZE):
+    """Выполняет все шаги обслуживания и возвращает отчёт в виде словаря."""
+    if days is None:
+        days = settings.MESSAGE_RETENTION_DAYS
+    if archive_dir is None:
+        archive_dir = settings.MESSAGE_ARCHIVE_DIR
+
+    latency_before = measure_latency()
+    size_before = table_size()
+
+    deduplicated, dedup_chars = deduplicate_texts(batch_size)
+    archived, archive_chars, archive_path = archive_messages(days, archive_dir, batch_size)
+    dead_before_vacuum = dead_rows()
+    vacuum()
+
+    size_after = table_size()
+    return {
+        'deduplicated': deduplicated,
+        'archived': archived,
+        'archive_path': archive_path,
+        'reclaimed_chars': dedup_chars + archive_chars,
+        'size_before': size_before,
+        'size_after': size_after,
+        'dead_rows_before_vacuum': dead_before_vacuum,
+        'dead_rows_after_vacuum': dead_rows(),
+        'latency_before_ms': latency_before,
+        'latency_after_ms': measure_latency(),
+    }
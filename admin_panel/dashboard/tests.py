@@ -1,3 +1,243 @@
-from django.test import TestCase
+import gzip
+import json
+import tempfile
+import time
+from datetime import date, datetime, timedelta
 
-# Create your tests here.
+from unittest import mock, skipUnless
+
+from django.db import connection
+from django.test import TestCase, TransactionTestCase
+from django.utils import timezone
+
+from shared import schema
+from shared.db import Database
+from shared.dates import MOSCOW_TZ, DayClock, day_bounds
+from shared.texts import FAQ_TEXT, text_digest
+
+from . import retention
+from .admin import count_new_users
+from .models import BotText, Message, User, UserStatistic
+
+
+class SharedSchemaTests(TestCase):
+    """Запросы бота должны совпадать со схемой, которую создают миграции."""
+
+    def execute(self, name, params):
+        with connection.cursor() as cursor:
+            cursor.execute(schema.STATEMENTS[name], params)
+            if cursor.description:
+                return cursor.fetchall()
+
+    def test_tables_match_models(self):
+        tables = connection.introspection.table_names()
+        for table, columns in schema.TABLES.items():
+            self.assertIn(table, tables)
+            with connection.cursor() as cursor:
+                description = connection.introspection.get_table_description(cursor, table)
+            self.assertEqual(set(columns), {column.name for column in description}, table)
+
+    def test_models_use_shared_tables(self):
+        self.assertEqual(User._meta.db_table, schema.USERS_TABLE)
+        self.assertEqual(Message._meta.db_table, schema.MESSAGES_TABLE)
+        self.assertEqual(UserStatistic._meta.db_table, schema.STATISTICS_TABLE)
+
+    def test_bot_statements_run_against_schema(self):
+        user_db_id = self.execute('create_user', (42, 'pupil', 'Иван', None))[0][0]
+        self.assertEqual(self.execute('get_user', (42,)), [(user_db_id, False, None)])
+
+        self.execute('set_last_subject', ('Физика', user_db_id))
+        self.execute('insert_message', (user_db_id, 'user', 'Что такое сила?', None))
+        self.assertEqual(User.objects.get(pk=user_db_id).last_subject, 'Физика')
+        self.assertEqual(Message.objects.get(user_id=user_db_id).content, 'Что такое сила?')
+
+    def store_text(self, key, content):
+        digest = text_digest(content)
+        self.execute('insert_text', (key, digest, content))
+        return self.execute('get_text', (digest,))[0][0]
+
+    def test_bot_text_reference(self):
+        old_id = self.store_text('faq', 'Старый текст')
+        self.assertEqual(self.store_text('faq', 'Старый текст'), old_id)
+        user_db_id = self.execute('create_user', (7, None, 'Анна', None))[0][0]
+        self.execute('insert_message', (user_db_id, 'bot', '', old_id))
+
+        # Изменённый текст получает новую строку, старая остаётся нетронутой
+        new_id = self.store_text('faq', FAQ_TEXT)
+        self.assertNotEqual(new_id, old_id)
+        self.execute('insert_message', (user_db_id, 'bot', '', new_id))
+
+        messages = Message.objects.filter(user_id=user_db_id).order_by('id')
+        self.assertEqual([message.full_content for message in messages], ['Старый текст', FAQ_TEXT])
+        self.assertEqual(BotText.objects.get(pk=old_id).content, 'Старый текст')
+
+    def test_statistics_upsert_accumulates(self):
+        today = date(2024, 9, 1)
+        self.execute('upsert_statistics', (today, 1, 0, 0))
+        self.execute('upsert_statistics', (today, 0, 1, 0))
+        self.execute('upsert_statistics', (today, 0, 0, 2))
+        stat = UserStatistic.objects.get(date=today)
+        self.assertEqual((stat.user_count, stat.command_count, stat.message_count), (1, 1, 2))
+
+    def test_prepared_placeholders(self):
+        for name in schema.PREPARED:
+            sql = schema.to_prepared(schema.STATEMENTS[name])
+            self.assertNotIn('%s', sql)
+            count = schema.placeholder_count(schema.STATEMENTS[name])
+            self.assertIn(f'${count}', sql)
+            self.assertNotIn(f'${count + 1}', sql)
+
+
+@skipUnless(connection.vendor == 'postgresql', "PREPARE/EXECUTE есть только в PostgreSQL")
+class PreparedStatementTests(TransactionTestCase):
+    """Методы Database выполняют запросы через EXECUTE на мигрированной схеме."""
+
+    def setUp(self):
+        connection.ensure_connection()
+        self.db = Database().attach(connection.connection)
+        self.addCleanup(self.deallocate)
+
+    def deallocate(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DEALLOCATE ALL;")
+
+    def test_hot_queries(self):
+        user_db_id = self.db.create_user(42, 'pupil', 'Иван', None)
+        self.assertEqual(self.db.get_user(42), (user_db_id, False, None))
+        self.assertIsNone(self.db.get_user(43))
+
+        self.db.set_last_subject(user_db_id, 'Физика')
+        self.db.insert_message(user_db_id, 'user', 'Что такое сила?')
+        self.assertEqual(self.db.get_user(42)[2], 'Физика')
+        self.assertEqual(Message.objects.get(user_id=user_db_id).content, 'Что такое сила?')
+
+        today = date(2024, 9, 1)
+        self.db.add_statistics(today, users=1)
+        self.db.add_statistics(today, commands=1)
+        self.db.add_statistics(today, messages=2)
+        stat = UserStatistic.objects.get(date=today)
+        self.assertEqual((stat.user_count, stat.command_count, stat.message_count), (1, 1, 2))
+
+
+class RetentionTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create(telegram_id=1, first_name='Иван')
+
+    def add_message(self, role, content, days_ago=0):
+        message = Message.objects.create(user=self.user, role=role, content=content)
+        Message.objects.filter(pk=message.pk).update(timestamp=timezone.now() - timedelta(days=days_ago))
+        return message
+
+    def test_deduplicate_texts(self):
+        for _ in range(3):
+            self.add_message('bot', FAQ_TEXT)
+        self.add_message('user', FAQ_TEXT)
+
+        rows, reclaimed = retention.deduplicate_texts(batch_size=2)
+
+        self.assertEqual(rows, 3)
+        self.assertEqual(reclaimed, 3 * len(FAQ_TEXT))
+        faq = BotText.objects.get(digest=text_digest(FAQ_TEXT))
+        self.assertEqual(Message.objects.filter(text=faq, content='').count(), 3)
+        self.assertEqual(Message.objects.get(role='user').content, FAQ_TEXT)
+
+    def test_sync_keeps_old_text_revisions(self):
+        old = BotText.objects.create(key='faq', content='Старый текст')
+        message = Message.objects.create(user=self.user, role='bot', content='', text=old)
+
+        retention.sync_bot_texts()
+
+        self.assertEqual(BotText.objects.get(pk=old.pk).content, 'Старый текст')
+        self.assertEqual(BotText.objects.filter(key='faq').count(), 2)
+        message.refresh_from_db()
+        self.assertEqual(message.full_content, 'Старый текст')
+
+    def test_archive_old_messages(self):
+        old = [self.add_message('user', f'вопрос {i}', days_ago=40) for i in range(5)]
+        fresh = self.add_message('user', 'новый вопрос', days_ago=1)
+        faq = BotText.objects.create(key='faq', content=FAQ_TEXT)
+        Message.objects.filter(pk=old[0].pk).update(text=faq, content='')
+
+        with tempfile.TemporaryDirectory() as archive_dir:
+            rows, reclaimed, path = retention.archive_messages(30, archive_dir, batch_size=2)
+            with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                archived = [json.loads(line) for line in archive]
+
+        self.assertEqual(rows, 5)
+        self.assertEqual(reclaimed, sum(len(f'вопрос {i}') for i in range(1, 5)))
+        self.assertEqual([item['id'] for item in archived], [message.pk for message in old])
+        self.assertEqual(archived[0]['content'], FAQ_TEXT)
+        self.assertEqual(list(Message.objects.values_list('pk', flat=True)), [fresh.pk])
+
+    def test_archive_runs_in_same_second_keep_both_files(self):
+        first = self.add_message('user', 'первый', days_ago=40)
+        now = timezone.now()
+
+        with tempfile.TemporaryDirectory() as archive_dir, mock.patch.object(timezone, 'now', return_value=now):
+            first_path = retention.archive_messages(30, archive_dir)[2]
+            second = self.add_message('user', 'второй', days_ago=40)
+            second_path = retention.archive_messages(30, archive_dir)[2]
+
+            self.assertNotEqual(first_path, second_path)
+            for path, message in ((first_path, first), (second_path, second)):
+                with gzip.open(path, 'rt', encoding='utf-8') as archive:
+                    self.assertEqual([json.loads(line)['id'] for line in archive], [message.pk])
+
+    def test_archive_nothing_expired(self):
+        self.add_message('user', 'новый вопрос')
+        with tempfile.TemporaryDirectory() as archive_dir:
+            self.assertEqual(retention.archive_messages(30, archive_dir), (0, 0, None))
+
+
+class DayBucketingTests(TestCase):
+    def test_day_bounds_moscow(self):
+        start, end = day_bounds(date(2024, 9, 1))
+        self.assertEqual(start.astimezone(timezone.utc), datetime(2024, 8, 31, 21, 0, tzinfo=timezone.utc))
+        self.assertEqual(end - start, timedelta(days=1))
+
+    def make_clock(self, moment):
+        self.moment = MOSCOW_TZ.localize(moment).timestamp()
+        clock = DayClock(clock=lambda: self.moment)
+        self.addCleanup(clock.stop)
+        return clock
+
+    def test_today_cached_until_midnight(self):
+        clock = self.make_clock(datetime(2024, 9, 1, 12, 0))
+        self.assertEqual(clock.today(), date(2024, 9, 1))
+        timer = clock._timer
+
+        self.moment += 3600
+        with mock.patch.object(clock, 'rollover', wraps=clock.rollover) as rollover:
+            for _ in range(3):
+                self.assertEqual(clock.today(), date(2024, 9, 1))
+        rollover.assert_not_called()
+        self.assertIs(clock._timer, timer)
+
+    def test_today_rolls_over_when_clock_passes_midnight(self):
+        clock = self.make_clock(datetime(2024, 9, 1, 23, 59, 59))
+        self.assertEqual(clock.today(), date(2024, 9, 1))
+
+        self.moment += 2
+        self.assertEqual(clock.today(), date(2024, 9, 2))
+
+    def test_timer_flips_day_at_midnight(self):
+        clock = self.make_clock(datetime(2024, 9, 1, 23, 59, 59, 900000))
+        self.assertEqual(clock.today(), date(2024, 9, 1))
+
+        # Таймер срабатывает через 0,1 с реального времени и читает уже
+        # переведённые часы; today() при этом не вызывается
+        self.moment += 1
+        deadline = time.monotonic() + 5
+        while clock._today != date(2024, 9, 2) and time.monotonic() < deadline:
+            time.sleep(0.01)
+        self.assertEqual(clock._today, date(2024, 9, 2))
+
+    def test_new_users_counted_by_moscow_day(self):
+        late = User.objects.create(telegram_id=1, first_name='Иван')
+        early = User.objects.create(telegram_id=2, first_name='Анна')
+        # 22:30 UTC 31 августа — это уже 1 сентября по Москве
+        User.objects.filter(pk=late.pk).update(start_date=datetime(2024, 8, 31, 22, 30, tzinfo=timezone.utc))
+        User.objects.filter(pk=early.pk).update(start_date=datetime(2024, 8, 31, 20, 30, tzinfo=timezone.utc))
+
+        self.assertEqual(count_new_users(date(2024, 9, 1)), 1)
+        self.assertEqual(count_new_users(date(2024, 8, 31)), 1)
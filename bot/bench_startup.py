@@ -0,0 +1,86 @@
+# bot/bench_startup.py
+#
+# Замер времени запуска рабочего процесса бота: импорт bot.py, создание
+# приложения, прогрев зависимостей и обработка первого обновления. Каждый
+# прогон выполняется в отдельном интерпретаторе, чтобы импорты были холодными.
+#
+#   python bench_startup.py [--runs 10]
+#
+# Если задан DB_NAME, используется настоящая база данных, иначе — хранилище
+# в памяти. Запросы к Telegram API перехватываются и в сеть не уходят.
+
+import argparse
+import json
+import os
+import statistics
+import subprocess
+import sys
+import time
+
+from fakes import FakeResponse, MemoryDatabase, start_update
+
+STAGES = ('import', 'create_app', 'warm_up', 'first_update', 'total')
+
+
+def measure(warm):
+    """Один прогон в текущем процессе; возвращает длительности этапов в мс."""
+    started = time.perf_counter()
+    timings = {}
+
+    import bot
+
+    timings['import'] = time.perf_counter()
+    app = bot.create_app(database=None if os.getenv('DB_NAME') else MemoryDatabase())
+    app.token = app.token or '0:benchmark'
+    timings['create_app'] = time.perf_counter()
+    if warm:
+        app.warm_up()
+        assert app.is_ready()
+    timings['warm_up'] = time.perf_counter()
+
+    from telebot import apihelper
+
+    chat_id = 100000 + os.getpid()
+    apihelper.CUSTOM_REQUEST_SENDER = lambda *args, **kwargs: FakeResponse(chat_id)
+    app.handle_update(start_update(chat_id))
+    timings['first_update'] = time.perf_counter()
+    app.close()
+
+    result = {}
+    previous = started
+    for stage in STAGES[:-1]:
+        result[stage] = (timings[stage] - previous) * 1000
+        previous = timings[stage]
+    result['total'] = (previous - started) * 1000
+    return result
+
+
+def run(runs, warm):
+    command = [sys.executable, __file__, '--child'] + (['--warm'] if warm else [])
+    samples = []
+    for _ in range(runs):
+        output = subprocess.run(command, check=True, capture_output=True, text=True).stdout
+        samples.append(json.loads(output.strip().splitlines()[-1]))
+    return {stage: statistics.median(sample[stage] for sample in samples) for stage in STAGES}
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Замер времени запуска бота")
+    parser.add_argument('--runs', type=int, default=10)
+    parser.add_argument('--child', action='store_true', help=argparse.SUPPRESS)
+    parser.add_argument('--warm', action='store_true', help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.child:
+        print(json.dumps(measure(args.warm)))
+        return
+
+    print(f"База данных: {'PostgreSQL' if os.getenv('DB_NAME') else 'в памяти'}, прогонов: {args.runs}")
+    print(f"{'режим':<12}" + ''.join(f"{stage:>14}" for stage in STAGES))
+    for label, warm in (('ленивый', False), ('прогрев', True)):
+        medians = run(args.runs, warm)
+        print(f"{label:<12}" + ''.join(f"{medians[stage]:>12.1f}мс" for stage in STAGES))
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,65 @@
+# bot/fakes.py
+#
+# Заглушки для тестов и бенчмарка запуска: хранилище в памяти вместо
+# PostgreSQL, ответ Telegram API и обновление с командой /start.
+
+import json
+
+
+class MemoryDatabase:
+    """Хранилище в памяти с тем же интерфейсом, что у shared.db.Database."""
+
+    def __init__(self):
+        self.users = {}
+
+    def get_user(self, telegram_id):
+        return self.users.get(telegram_id)
+
+    def create_user(self, telegram_id, username, first_name, last_name):
+        self.users[telegram_id] = (len(self.users) + 1, False, None)
+        return self.users[telegram_id][0]
+
+    def set_last_subject(self, user_db_id, subject):
+        pass
+
+    def insert_message(self, user_db_id, role, content):
+        pass
+
+    def add_statistics(self, day, users=0, commands=0, messages=0):
+        pass
+
+    def ping(self):
+        return True
+
+    def close(self):
+        pass
+
+
+class FakeResponse:
+    status_code = 200
+    reason = 'OK'
+
+    def __init__(self, chat_id):
+        self.payload = {
+            'ok': True,
+            'result': {'message_id': 1, 'date': 0, 'chat': {'id': chat_id, 'type': 'private'}},
+        }
+        self.text = json.dumps(self.payload)
+
+    def json(self):
+        return self.payload
+
+
+def start_update(chat_id):
+    sender = {'id': chat_id, 'is_bot': False, 'first_name': 'Бенчмарк'}
+    return {
+        'update_id': 1,
+        'message': {
+            'message_id': 1,
+            'date': 0,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': sender,
+            'text': '/start',
+            'entities': [{'type': 'bot_command', 'offset': 0, 'length': 6}],
+        },
+    }
@@ -0,0 +1,339 @@
+# bot/handlers.py
+#
+# Обработчики обновлений Telegram. Модуль импортируется фабрикой приложения
+# (bot.py) только при первом обращении к боту, вместе с telebot и requests.
+
+import logging
+from functools import partial
+import requests
+from telebot import types
+from telebot.apihelper import ApiTelegramException
+
+from shared.dates import day_clock
+from shared.texts import FAQ_TEXT, FEEDBACK_TEXT, HELP_TEXT, TERMS_ACCEPTED_TEXT
+
+logger = logging.getLogger('bot.handlers')
+
+# Функция для отправки сообщения в Yandex GPT
+def send_message_to_gpt(app, message):
+    url = "https://llm.api.cloud.yandex.net/foundationModels/v1/completion"
+    headers = {
+        "Content-Type": "application/json",
+        "Authorization": f"Api-Key {app.api_key}"
+    }
+
+    # Системный промпт
+    system_prompt = (
+        "Вы — дружелюбный и понимающий помощник для обучающихся. "
+        "Отвечай только на вопросы. Не предлагай ничего своего. "
+        "Не приветствуй пользователя. "
+        "Тебя зовут Эврика. "
+        "Не начинай свой ответ с приветствия и со своего имени. "
+        "Объясняйте темы простым и понятным языком для детей от 6 до 15 лет. "
+        "Используй мотивирующий тон, чтобы ученику было интересно и весело. "
+        "Используйте примеры из повседневной жизни, чтобы сделать сложные концепции более доступными и наглядными. "
+        "Поддерживайте позитивный тон и иногда добавляйте эмодзи, чтобы сделать общение веселым. "
+        "Не отвечай на темы секса, сексуальные темы, порнографию, наркотики, экстремизм, терроризм. Вежливо отказывай."
+    )
+
+    payload = {
+        "modelUri": f"gpt://{app.catalog_id}/yandexgpt/rc",
+        "completionOptions": {
+            "stream": False,
+            "temperature": 0.7,
+            "maxTokens": 2000
+        },
+        "messages": [
+            {"role": "system", "text": system_prompt},
+            {"role": "user", "text": message}
+        ]
+    }
+
+    response = requests.post(url, headers=headers, json=payload)
+
+    if response.status_code == 200:
+        result = response.json()
+        text = result['result']['alternatives'][0]['message']['text']
+        return text
+    else:
+        logger.error(f"Ошибка при обращении к Yandex GPT: {response.status_code} - {response.text}")
+        return "Извините, произошла ошибка при обработке вашего запроса."
+
+# Вспомогательная функция для записи сообщений в базу данных
+def log_message(app, user_id, role, content, is_command=False):
+    try:
+        user = app.db.get_user(user_id)
+        if user:
+            user_db_id = user[0]
+            app.db.insert_message(user_db_id, role, content)
+
+            if role == 'user':
+                today = day_clock.today()
+                if is_command:
+                    app.db.add_statistics(today, commands=1)
+                else:
+                    app.db.add_statistics(today, messages=1)
+    except Exception as e:
+        logger.exception(f"Ошибка при записи сообщения: {e}")
+
+# Вспомогательная функция для получения или создания пользователя
+def get_or_create_user(app, message):
+    user_id = message.from_user.id
+    username = message.from_user.username
+    first_name = message.from_user.first_name
+    last_name = message.from_user.last_name
+
+    user = app.db.get_user(user_id)
+    if user:
+        return user[0], user[1]  # user_db_id, is_banned
+    else:
+        user_db_id = app.db.create_user(user_id, username, first_name, last_name)
+        # Обновляем статистику
+        today = day_clock.today()
+        app.db.add_statistics(today, users=1)
+        return user_db_id, False
+
+# Обработчик команды /start
+def handle_start(app, message):
+    user_id = message.from_user.id
+
+    user_db_id, is_banned = get_or_create_user(app, message)
+
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    # Создаем инлайн-клавиатуру с кнопками "Да" и "Нет"
+    keyboard = types.InlineKeyboardMarkup()
+    yes_button = types.InlineKeyboardButton(text="Да", callback_data="accept_terms")
+    no_button = types.InlineKeyboardButton(text="Нет", callback_data="decline_terms")
+    keyboard.add(yes_button, no_button)
+
+    # Отправляем сообщение с соглашением и клавиатурой
+    try:
+        app.bot.send_message(
+            message.chat.id,
+            "Пожалуйста, перед тем, как начать наше образовательное путешествие, прочитайте пользовательское соглашение.\nhttps://edpalm.academy/usloviya-predostavleniya-servisa",
+            reply_markup=keyboard
+        )
+    except ApiTelegramException as e:
+        logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+
+# Обработчик нажатий на инлайн-кнопки
+def callback_inline(app, call):
+    user_id = call.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    user_db_id, is_banned, last_subject = user
+
+    if is_banned:
+        try:
+            app.bot.send_message(call.message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    if call.data == "accept_terms":
+        try:
+            response_text = TERMS_ACCEPTED_TEXT
+            app.bot.send_message(call.message.chat.id, response_text)
+            log_message(app, user_id, 'bot', response_text)
+            # Принудительно вызываем команду /subject
+            handle_subject_command(app, call.message)
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+    elif call.data == "decline_terms":
+        handle_start(app, call.message)
+    elif call.data.startswith("subject_"):
+        # Пользователь выбрал предмет
+        subject = call.data[len("subject_"):]
+        # Сохраняем выбранный предмет в базе данных
+        try:
+            app.db.set_last_subject(user_db_id, subject)
+
+            response_text = f"Теперь я буду отвечать на вопросы, связанные с предметом: {subject}"
+            app.bot.send_message(call.message.chat.id, response_text)
+            log_message(app, user_id, 'bot', response_text)
+        except Exception as e:
+            logger.exception(f"Ошибка при сохранении предмета для пользователя {user_id}: {e}")
+    else:
+        pass  # Обработка других случаев, если необходимо
+
+# Обработчик команды /faq
+def handle_faq(app, message):
+    user_id = message.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    is_banned = user[1]
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    faq_text = FAQ_TEXT
+    try:
+        app.bot.send_message(message.chat.id, faq_text)
+        # Логируем сообщение как команду
+        log_message(app, user_id, 'user', '/faq', is_command=True)
+        log_message(app, user_id, 'bot', faq_text)
+    except ApiTelegramException as e:
+        logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+
+# Обработчик команды /feedback
+def handle_feedback(app, message):
+    user_id = message.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    is_banned = user[1]
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    feedback_text = FEEDBACK_TEXT
+    try:
+        app.bot.send_message(message.chat.id, feedback_text)
+        # Логируем сообщение как команду
+        log_message(app, user_id, 'user', '/feedback', is_command=True)
+        log_message(app, user_id, 'bot', feedback_text)
+    except ApiTelegramException as e:
+        logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+
+# Обработчик команды /help
+def handle_help(app, message):
+    user_id = message.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    is_banned = user[1]
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    help_text = HELP_TEXT
+    try:
+        app.bot.send_message(message.chat.id, help_text)
+        # Логируем сообщение как команду
+        log_message(app, user_id, 'user', '/help', is_command=True)
+        log_message(app, user_id, 'bot', help_text)
+    except ApiTelegramException as e:
+        logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+
+# Обработчик команды /subject
+def handle_subject_command(app, message):
+    user_id = message.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    user_db_id, is_banned, last_subject = user
+
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    # Создаем инлайн-клавиатуру с предметами
+    keyboard = types.InlineKeyboardMarkup(row_width=2)
+    subjects = [
+        "Алгебра", "Русский язык", "Английский язык", "География",
+        "Информатика", "Обществознание", "Окружающий мир", "Геометрия",
+        "Литература", "Биология", "История", "Физика",
+        "Химия", "Математика"
+    ]
+    buttons = [types.InlineKeyboardButton(text=subj, callback_data=f"subject_{subj}") for subj in subjects]
+    keyboard.add(*buttons)
+
+    try:
+        app.bot.send_message(
+            message.chat.id,
+            "Пожалуйста, выбери необходимый предмет. Ознакомиться со всеми моими возможностями можно, нажав на кнопку «Меню».",
+            reply_markup=keyboard
+        )
+        # Логируем сообщение как команду
+        log_message(app, user_id, 'user', '/subject', is_command=True)
+    except ApiTelegramException as e:
+        logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+
+# Обработчик всех текстовых сообщений
+def handle_message(app, message):
+    user_id = message.from_user.id
+
+    user = app.db.get_user(user_id)
+    if not user:
+        logger.error(f"Пользователь с telegram_id={user_id} не найден.")
+        return
+    user_db_id, is_banned, last_subject = user
+
+    if is_banned:
+        try:
+            app.bot.send_message(message.chat.id, "Извините, Вы не можете воспользоваться Эврикой.")
+        except ApiTelegramException as e:
+            logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+        return
+
+    # Проверяем, выбран ли предмет у пользователя
+    try:
+        if last_subject:
+            # Если предмет выбран, отправляем сообщение в Yandex GPT
+            user_message = message.text
+
+            # Логируем сообщение пользователя как обычное сообщение
+            log_message(app, user_id, 'user', user_message, is_command=False)
+
+            try:
+                gpt_response = send_message_to_gpt(app, user_message)
+                app.bot.send_message(message.chat.id, gpt_response)
+                # Логируем ответ бота
+                log_message(app, user_id, 'bot', gpt_response)
+            except ApiTelegramException as e:
+                if e.error_code == 403:
+                    logger.info(f"Пользователь {user_id} заблокировал бота.")
+                else:
+                    logger.error(f"Ошибка при отправке сообщения пользователю {user_id}: {e}")
+            except Exception as e:
+                logger.exception(f"Произошла ошибка при обработке сообщения от пользователя {user_id}: {e}")
+                app.bot.send_message(message.chat.id, "Извините, произошла ошибка при обработке вашего сообщения.")
+        else:
+            # Если предмет не выбран, повторяем соглашение
+            handle_start(app, message)
+    except Exception as e:
+        logger.exception(f"Ошибка при работе с базой данных для пользователя {user_id}: {e}")
+        app.bot.send_message(message.chat.id, "Извините, произошла ошибка при обращении к базе данных.")
+
+
+# Регистрация обработчиков в порядке их приоритета. Каждый обработчик получает
+# своё приложение первым аргументом, поэтому несколько приложений в одном
+# процессе не пересекаются
+def register(application, bot):
+    bot.register_message_handler(partial(handle_start, application), commands=['start'])
+    bot.register_callback_query_handler(partial(callback_inline, application), func=lambda call: True)
+    bot.register_message_handler(partial(handle_faq, application), commands=['faq'])
+    bot.register_message_handler(partial(handle_feedback, application), commands=['feedback'])
+    bot.register_message_handler(partial(handle_help, application), commands=['help'])
+    bot.register_message_handler(partial(handle_subject_command, application), commands=['subject'])
+    bot.register_message_handler(partial(handle_message, application), func=lambda message: True)
@@ -0,0 +1,411 @@
+# bot/supervisor.py
+#
+# Супервизор бота: получает обновления Telegram и раздаёт их N рабочим
+# процессам по хешу chat id, поэтому сообщения одного пользователя всегда
+# обрабатываются одним процессом и по порядку.
+#
+#   SIGTERM / SIGINT — перестать принимать обновления, дождаться обработки
+#                      уже полученных и завершиться;
+#   SIGHUP           — поочерёдно перезапустить рабочие процессы без простоя.
+
+import logging
+import math
+import multiprocessing
+import os
+import signal
+import sys
+import threading
+import time
+from logging.handlers import RotatingFileHandler
+from queue import Empty
+
+from telebot import apihelper
+
+import bot
+
+# Значения по умолчанию для BOT_WORKERS и BOT_DRAIN_TIMEOUT
+WORKERS = 4
+# Сколько секунд рабочий процесс может дорабатывать очередь при остановке
+DRAIN_TIMEOUT = 120
+POLL_TIMEOUT = 10
+
+BACKOFF_BASE = 1
+BACKOFF_MAX = 60
+# Процесс, проработавший столько секунд, считается стабильным и сбрасывает backoff
+STABLE_AFTER = 60
+# Как часто простаивающий рабочий процесс проверяет, жив ли супервизор
+PARENT_CHECK_INTERVAL = 5
+
+logger = logging.getLogger('supervisor')
+logger.setLevel(logging.INFO)
+
+# Рабочие процессы заново импортируют этот модуль, чтобы получить run_worker,
+# поэтому здесь нет побочных эффектов: .env и файл лога подключает main()
+context = multiprocessing.get_context('spawn')
+
+
+def chat_id_of(update):
+    """chat id обновления в виде JSON; для обновлений без чата — id пользователя."""
+    for kind in ('message', 'edited_message', 'callback_query'):
+        payload = update.get(kind)
+        if not payload:
+            continue
+        chat = payload.get('chat') or (payload.get('message') or {}).get('chat')
+        if chat:
+            return chat['id']
+        if payload.get('from'):
+            return payload['from']['id']
+    return update['update_id']
+
+
+def backoff_delay(failures):
+    return min(BACKOFF_MAX, BACKOFF_BASE * 2 ** max(failures - 1, 0))
+
+
+def setup_logging():
+    if logger.handlers:
+        return
+    handler = RotatingFileHandler('supervisor.log', maxBytes=10*1024*1024, backupCount=5, encoding='utf-8')
+    handler.setFormatter(logging.Formatter('%(asctime)s %(levelname)s %(message)s'))
+    logger.addHandler(handler)
+
+
+def parent_alive():
+    parent = multiprocessing.parent_process()
+    return parent is None or parent.is_alive()
+
+
+def run_worker(index, token, queue, ready, gate):
+    # Останавливает рабочий процесс только супервизор (сигналом None в очереди),
+    # чтобы SIGTERM, отправленный всей группе процессов, не прерывал запросы
+    signal.signal(signal.SIGINT, signal.SIG_IGN)
+    signal.signal(signal.SIGTERM, signal.SIG_IGN)
+    signal.signal(signal.SIGHUP, signal.SIG_IGN)
+
+    bot.setup_logging(f'bot-{index}.log')
+    app = bot.create_app(token=token).warm_up()
+    if not app.is_ready():
+        raise RuntimeError(f"Рабочий процесс {index} не готов к обработке обновлений")
+    ready.set()
+    # При плавном перезапуске новый процесс ждёт, пока старый доработает свою
+    # очередь, иначе порядок сообщений пользователя нарушится. Сигналы здесь
+    # игнорируются, поэтому, если супервизор убит (SIGKILL, OOM), процесс
+    # замечает это сам и завершается, а не остаётся сиротой с открытым
+    # соединением с базой
+    while not gate.wait(PARENT_CHECK_INTERVAL):
+        if not parent_alive():
+            bot.logger.error(f"Супервизор завершился, рабочий процесс {index} останавливается.")
+            app.close()
+            return
+
+    while True:
+        try:
+            raw = queue.get(timeout=PARENT_CHECK_INTERVAL)
+        except Empty:
+            if parent_alive():
+                continue
+            bot.logger.error(f"Супервизор завершился, рабочий процесс {index} останавливается.")
+            break
+        if raw is None:
+            break
+        try:
+            app.handle_update(raw)
+        except Exception as e:
+            bot.logger.exception(f"Ошибка при обработке обновления {raw.get('update_id')}: {e}")
+            # Database не переподключается сам: без соединения все следующие
+            # обновления шарда тоже упадут. Завершаемся с ошибкой, и супервизор
+            # перезапустит процесс, который подключится и подготовит запросы заново
+            if not app.is_ready():
+                bot.logger.error(f"Рабочий процесс {index} потерял соединение с базой данных, перезапуск.")
+                sys.exit(1)
+
+    app.close()
+
+
+class Worker:
+    def __init__(self, index, queue, token, gated=False):
+        self.index = index
+        self.queue = queue
+        self.ready = context.Event()
+        self.gate = context.Event()
+        if not gated:
+            self.gate.set()
+        self.process = context.Process(
+            target=run_worker,
+            args=(index, token, queue, self.ready, self.gate),
+            name=f'bot-worker-{index}',
+        )
+        self.started_at = None
+
+    def start(self):
+        self.process.start()
+        self.started_at = time.monotonic()
+        logger.info(f"Запущен рабочий процесс {self.index} (pid {self.process.pid}).")
+        return self
+
+    def is_alive(self):
+        return self.process.is_alive()
+
+
+class Slot:
+    """Шард обновлений: очередь и обслуживающий её рабочий процесс."""
+
+    def __init__(self, index):
+        self.index = index
+        self.queue = context.Queue()
+        self.worker = None
+        self.failures = 0
+        self.restart_at = 0
+        # Плавный перезапуск: новый процесс ждёт, пока старая очередь old_queue
+        # не будет обработана до конца процессом retiring
+        self.replacement = None
+        self.old_queue = None
+        self.retiring = None
+        self.retire_deadline = None
+        self.redrain_at = 0
+
+
+class Supervisor:
+    def __init__(self, token, workers=WORKERS, drain_timeout=DRAIN_TIMEOUT):
+        self.token = token
+        self.drain_timeout = drain_timeout
+        self.slots = [Slot(index) for index in range(workers)]
+        self.offset = None
+        self.stopping = False
+        self.rolling = []
+
+    def route(self, update):
+        return self.slots[hash(chat_id_of(update)) % len(self.slots)]
+
+    def install_signal_handlers(self):
+        signal.signal(signal.SIGTERM, self.request_stop)
+        signal.signal(signal.SIGINT, self.request_stop)
+        signal.signal(signal.SIGHUP, self.request_rolling_restart)
+
+    def request_stop(self, signum, frame):
+        logger.info("Получен сигнал остановки, завершаем обработку полученных обновлений.")
+        self.stopping = True
+
+    def request_rolling_restart(self, signum, frame):
+        if not self.rolling:
+            logger.info("Плавный перезапуск рабочих процессов.")
+            self.rolling = list(self.slots)
+
+    def run(self):
+        self.install_signal_handlers()
+        for slot in self.slots:
+            slot.worker = Worker(slot.index, slot.queue, self.token).start()
+
+        while not self.stopping:
+            self.poll()
+            self.check_workers()
+            self.step_rolling_restart()
+
+        self.shutdown()
+
+    def poll_timeout(self):
+        # Long polling не должен задерживать плавный перезапуск и перезапуск
+        # упавших процессов, но и не превращаться в частые пустые запросы
+        if self.rolling:
+            return 1
+        now = time.monotonic()
+        waits = [slot.restart_at - now for slot in self.slots if slot.worker is None]
+        if not waits:
+            return POLL_TIMEOUT
+        return min(POLL_TIMEOUT, max(1, math.ceil(min(waits))))
+
+    def poll(self):
+        timeout = self.poll_timeout()
+        try:
+            updates = apihelper.get_updates(self.token, offset=self.offset, timeout=timeout,
+                                            long_polling_timeout=timeout)
+        except Exception as e:
+            logger.error(f"Ошибка при получении обновлений: {e}")
+            time.sleep(1)
+            return
+        for update in updates:
+            self.route(update).queue.put(update)
+            self.offset = update['update_id'] + 1
+
+    def check_workers(self):
+        now = time.monotonic()
+        for slot in self.slots:
+            worker = slot.worker
+            if worker is not None and worker.is_alive():
+                if slot.failures and now - worker.started_at > STABLE_AFTER:
+                    slot.failures = 0
+                continue
+            if worker is not None:
+                # Процесс упал: перезапускаем на той же очереди с растущей задержкой
+                slot.failures += 1
+                delay = backoff_delay(slot.failures)
+                logger.error(f"Рабочий процесс {slot.index} завершился с кодом {worker.process.exitcode}, "
+                             f"перезапуск через {delay} с.")
+                slot.worker = None
+                slot.restart_at = now + delay
+            if now >= slot.restart_at:
+                # Пока старый процесс дорабатывает очередь, новый не должен её читать
+                slot.worker = Worker(slot.index, slot.queue, self.token, gated=slot.old_queue is not None).start()
+
+    def step_rolling_restart(self):
+        if not self.rolling:
+            return
+        slot = self.rolling[0]
+
+        if slot.old_queue is not None:
+            self.step_handover(slot)
+            if slot.old_queue is None:
+                self.rolling.pop(0)
+            return
+
+        if slot.replacement is None:
+            slot.replacement = Worker(slot.index, context.Queue(), self.token, gated=True).start()
+            return
+
+        if not slot.replacement.is_alive():
+            logger.error(f"Новый рабочий процесс {slot.index} не запустился, плавный перезапуск прерван.")
+            slot.replacement = None
+            self.rolling = []
+            return
+
+        if slot.replacement.ready.is_set():
+            # Новые обновления идут в очередь нового процесса, а старую очередь
+            # дорабатывает прежний процесс. Если он упал и ждёт перезапуска,
+            # step_handover запустит для старой очереди отдельный процесс
+            slot.old_queue, slot.retiring = slot.queue, slot.worker
+            slot.worker, slot.queue = slot.replacement, slot.replacement.queue
+            slot.replacement = None
+            slot.old_queue.put(None)
+            slot.retire_deadline = time.monotonic() + self.drain_timeout
+            slot.redrain_at = 0
+
+    def step_handover(self, slot):
+        now = time.monotonic()
+        retiring = slot.retiring
+
+        if retiring is not None and retiring.is_alive():
+            if now < slot.retire_deadline:
+                return
+            logger.error(f"Рабочий процесс {slot.index} не завершился за {self.drain_timeout} с, завершаем принудительно.")
+            retiring.process.terminate()
+            retiring.process.join()
+            self.finish_handover(slot)
+            return
+
+        if retiring is not None and retiring.process.exitcode == 0:
+            self.finish_handover(slot)
+            return
+
+        if now >= slot.retire_deadline:
+            logger.error(f"Старая очередь рабочего процесса {slot.index} не обработана за {self.drain_timeout} с, "
+                         f"оставшиеся в ней обновления потеряны.")
+            self.finish_handover(slot)
+            return
+
+        if retiring is not None:
+            # Процесс упал, не доработав старую очередь: перезапускаем его на ней
+            slot.failures += 1
+            delay = backoff_delay(slot.failures)
+            logger.error(f"Рабочий процесс {slot.index} завершился с кодом {retiring.process.exitcode} "
+                         f"при обработке старой очереди, перезапуск через {delay} с.")
+            slot.retiring = None
+            slot.redrain_at = now + delay
+            # Процесс мог успеть забрать сигнал завершения
+            slot.old_queue.put(None)
+            return
+
+        if now >= slot.redrain_at:
+            slot.retiring = Worker(slot.index, slot.old_queue, self.token).start()
+
+    def finish_handover(self, slot):
+        slot.old_queue = None
+        slot.retiring = None
+        if slot.worker is not None:
+            slot.worker.gate.set()
+
+    def drain_queue(self, index, queue, worker, deadline):
+        """
+        Обрабатывает очередь до конца, перезапуская упавший процесс, пока не
+        истёк срок. Возвращает True, если очередь обработана полностью.
+        """
+        queue.put(None)
+        failures = 0
+        while True:
+            if worker is None:
+                worker = Worker(index, queue, self.token).start()
+            worker.gate.set()
+            worker.process.join(max(0, deadline - time.monotonic()))
+            if worker.process.exitcode == 0:
+                return True
+            if worker.is_alive():
+                logger.error(f"Рабочий процесс {index} не успел обработать очередь, завершаем принудительно.")
+                worker.process.terminate()
+                worker.process.join()
+                return False
+
+            failures += 1
+            delay = backoff_delay(failures)
+            if time.monotonic() + delay >= deadline:
+                logger.error(f"Рабочий процесс {index} завершился с кодом {worker.process.exitcode}, "
+                             f"очередь не обработана до конца.")
+                return False
+            logger.error(f"Рабочий процесс {index} завершился с кодом {worker.process.exitcode} "
+                         f"при остановке, перезапуск через {delay} с.")
+            time.sleep(delay)
+            queue.put(None)
+            worker = None
+
+    def drain_slot(self, slot, deadline, results):
+        # Сначала старая очередь плавного перезапуска, затем текущая, чтобы
+        # сохранить порядок сообщений пользователя
+        ok = True
+        if slot.old_queue is not None:
+            ok = self.drain_queue(slot.index, slot.old_queue, slot.retiring, deadline) and ok
+        ok = self.drain_queue(slot.index, slot.queue, slot.worker, deadline) and ok
+        results[slot.index] = ok
+
+    def shutdown(self):
+        for slot in self.slots:
+            if slot.replacement is not None:
+                slot.replacement.process.terminate()
+                slot.replacement.process.join()
+                slot.replacement = None
+
+        # Каждый шард дорабатывается в своём потоке, в том числе шарды, чей
+        # процесс упал и ждёт перезапуска: их очереди тоже нужно обработать
+        deadline = time.monotonic() + self.drain_timeout
+        results = {}
+        threads = [threading.Thread(target=self.drain_slot, args=(slot, deadline, results)) for slot in self.slots]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        # Подтверждаем Telegram полученные обновления только после того, как
+        # они обработаны; иначе последняя полученная порция придёт повторно.
+        # long_polling_timeout=0 telebot считает незаданным и ждёт 10 с,
+        # поэтому задаём минимальную секунду
+        if self.offset is not None and all(results.values()):
+            try:
+                apihelper.get_updates(self.token, offset=self.offset, limit=1, long_polling_timeout=1)
+            except Exception as e:
+                logger.error(f"Не удалось подтвердить обновления: {e}")
+        elif self.offset is not None:
+            logger.error("Не все очереди обработаны, последние полученные обновления не подтверждены.")
+        logger.info("Все рабочие процессы остановлены.")
+
+
+def main():
+    from shared.config import load_env
+
+    load_env()
+    setup_logging()
+    Supervisor(
+        token=os.getenv('TELEGRAM_BOT_TOKEN'),
+        workers=int(os.getenv('BOT_WORKERS', WORKERS)),
+        drain_timeout=float(os.getenv('BOT_DRAIN_TIMEOUT', DRAIN_TIMEOUT)),
+    ).run()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,52 @@
+# bot/test_bot.py
+#
+#   python -m unittest test_bot
+
+import subprocess
+import sys
+import unittest
+
+from telebot import apihelper
+
+import bot
+from fakes import FakeResponse, MemoryDatabase, start_update
+
+
+class LazyImportTests(unittest.TestCase):
+    def test_import_does_not_load_heavy_dependencies(self):
+        code = (
+            "import sys, bot; "
+            "print(','.join(m for m in ('telebot', 'requests', 'psycopg2', 'pytz', 'dotenv') if m in sys.modules))"
+        )
+        output = subprocess.run([sys.executable, '-c', code], check=True, capture_output=True, text=True).stdout
+        self.assertEqual(output.strip(), '')
+
+
+class ApplicationTests(unittest.TestCase):
+    def setUp(self):
+        apihelper.CUSTOM_REQUEST_SENDER = lambda *args, **kwargs: FakeResponse(1)
+        self.addCleanup(setattr, apihelper, 'CUSTOM_REQUEST_SENDER', None)
+
+    def make_app(self):
+        app = bot.create_app(database=MemoryDatabase())
+        app.token = '0:test'
+        return app
+
+    def test_not_ready_before_warm_up(self):
+        app = self.make_app()
+        self.assertFalse(app.is_ready())
+        self.assertTrue(app.warm_up().is_ready())
+
+    def test_handlers_bound_to_their_application(self):
+        first, second = self.make_app().warm_up(), self.make_app().warm_up()
+
+        first.handle_update(start_update(1))
+        second.handle_update(start_update(2))
+        first.handle_update(start_update(3))
+
+        self.assertEqual(sorted(first.db.users), [1, 3])
+        self.assertEqual(sorted(second.db.users), [2])
+
+
+if __name__ == '__main__':
+    unittest.main()
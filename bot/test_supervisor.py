@@ -0,0 +1,186 @@
+# bot/test_supervisor.py
+#
+#   python -m unittest test_supervisor
+
+import os
+import queue
+import signal
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import unittest
+from unittest import mock
+
+from telebot import apihelper
+
+import supervisor
+
+
+def message_update(update_id, chat_id, text='привет'):
+    return {
+        'update_id': update_id,
+        'message': {
+            'message_id': update_id,
+            'date': 0,
+            'text': text,
+            'chat': {'id': chat_id, 'type': 'private'},
+            'from': {'id': chat_id, 'is_bot': False, 'first_name': 'Иван'},
+        },
+    }
+
+
+def callback_update(update_id, chat_id, user_id=None):
+    return {
+        'update_id': update_id,
+        'callback_query': {
+            'id': str(update_id),
+            'from': {'id': user_id or chat_id, 'is_bot': False, 'first_name': 'Иван'},
+            'data': 'accept_terms',
+            'message': message_update(update_id, chat_id)['message'],
+        },
+    }
+
+
+class ImportTests(unittest.TestCase):
+    def test_import_has_no_side_effects(self):
+        # Модуль импортирует каждый рабочий процесс, поэтому импорт не должен
+        # читать .env и создавать файлы логов
+        with tempfile.TemporaryDirectory() as cwd:
+            code = "import supervisor; print(bool(supervisor.logger.handlers))"
+            env = dict(os.environ, PYTHONPATH=os.path.dirname(os.path.abspath(supervisor.__file__)))
+            output = subprocess.run([sys.executable, '-c', code], cwd=cwd, env=env,
+                                    check=True, capture_output=True, text=True).stdout
+            self.assertEqual(output.strip(), 'False')
+            self.assertEqual(os.listdir(cwd), [])
+
+
+class ChatIdTests(unittest.TestCase):
+    def test_message(self):
+        self.assertEqual(supervisor.chat_id_of(message_update(1, 42)), 42)
+
+    def test_callback_query_uses_message_chat(self):
+        self.assertEqual(supervisor.chat_id_of(callback_update(1, -100500, user_id=42)), -100500)
+
+    def test_callback_query_without_message_uses_sender(self):
+        update = callback_update(1, 42)
+        del update['callback_query']['message']
+        self.assertEqual(supervisor.chat_id_of(update), 42)
+
+    def test_unknown_update_falls_back_to_update_id(self):
+        self.assertEqual(supervisor.chat_id_of({'update_id': 7, 'poll': {}}), 7)
+
+
+class RouteTests(unittest.TestCase):
+    def setUp(self):
+        self.supervisor = supervisor.Supervisor(token='0:test', workers=4)
+
+    def test_same_chat_same_slot(self):
+        # Все обновления одного чата, в том числе нажатия кнопок, попадают в
+        # один шард — на этом держится порядок сообщений пользователя
+        for chat_id in (1, 42, 10 ** 12, -100500):
+            slots = {self.supervisor.route(message_update(n, chat_id)).index for n in range(20)}
+            slots.add(self.supervisor.route(callback_update(99, chat_id)).index)
+            self.assertEqual(len(slots), 1, chat_id)
+
+    def test_chats_spread_over_slots(self):
+        slots = {self.supervisor.route(message_update(n, n)).index for n in range(100)}
+        self.assertEqual(slots, {0, 1, 2, 3})
+
+
+class BackoffTests(unittest.TestCase):
+    def test_exponential_with_cap(self):
+        delays = [supervisor.backoff_delay(failures) for failures in range(1, 10)]
+        self.assertEqual(delays, [1, 2, 4, 8, 16, 32, 60, 60, 60])
+
+    def test_poll_timeout_waits_for_restart(self):
+        sv = supervisor.Supervisor(token='0:test', workers=2)
+        for slot in sv.slots:
+            slot.worker = object()
+        self.assertEqual(sv.poll_timeout(), supervisor.POLL_TIMEOUT)
+
+        # Процесс в backoff: опрос не дольше, чем до его перезапуска, и не короче секунды
+        sv.slots[0].worker = None
+        sv.slots[0].restart_at = time.monotonic() + 3
+        self.assertEqual(sv.poll_timeout(), 3)
+        sv.slots[0].restart_at = time.monotonic() - 5
+        self.assertEqual(sv.poll_timeout(), 1)
+
+
+class ShutdownTests(unittest.TestCase):
+    def test_confirms_offset_without_long_poll(self):
+        requests = []
+
+        def sender(method, url, params=None, **kwargs):
+            requests.append((url.rsplit('/', 1)[-1], params))
+            return mock.Mock(status_code=200, reason='OK', text='', json=lambda: {'ok': True, 'result': []})
+
+        apihelper.CUSTOM_REQUEST_SENDER = sender
+        self.addCleanup(setattr, apihelper, 'CUSTOM_REQUEST_SENDER', None)
+
+        sv = supervisor.Supervisor(token='0:test', workers=0)
+        sv.offset = 42
+        sv.shutdown()
+
+        # timeout — это long polling на стороне Telegram: не 10 с по умолчанию
+        self.assertEqual(requests, [('getUpdates', {'offset': 42, 'limit': 1, 'timeout': 1})])
+
+
+class RunWorkerTests(unittest.TestCase):
+    def setUp(self):
+        for signum in (signal.SIGINT, signal.SIGTERM, signal.SIGHUP):
+            self.addCleanup(signal.signal, signum, signal.getsignal(signum))
+        self.app = mock.Mock()
+        self.app.warm_up.return_value = self.app
+        self.app.is_ready.return_value = True
+        for name, value in (('create_app', mock.Mock(return_value=self.app)), ('setup_logging', mock.Mock())):
+            patcher = mock.patch.object(supervisor.bot, name, value)
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+    def run_worker(self, *updates, gated=False):
+        self.queue = queue.Queue()
+        for update in updates:
+            self.queue.put(update)
+        gate = threading.Event()
+        if not gated:
+            gate.set()
+        supervisor.run_worker(0, '1:supervisor', self.queue, threading.Event(), gate)
+
+    def test_uses_supervisor_token(self):
+        self.run_worker(None)
+        supervisor.bot.create_app.assert_called_once_with(token='1:supervisor')
+        self.app.close.assert_called_once_with()
+
+    def test_failed_update_does_not_stop_worker(self):
+        self.app.handle_update.side_effect = [RuntimeError('сбой'), None]
+        with self.assertLogs('bot', 'ERROR'):
+            self.run_worker(message_update(1, 1), message_update(2, 1), None)
+        self.assertEqual(self.app.handle_update.call_count, 2)
+
+    def test_exits_for_restart_when_database_lost(self):
+        self.app.handle_update.side_effect = RuntimeError('connection already closed')
+        self.app.is_ready.side_effect = [True, False]
+        with self.assertLogs('bot', 'ERROR'), self.assertRaises(SystemExit) as exit:
+            self.run_worker(message_update(1, 1), message_update(2, 1), None)
+        self.assertEqual(exit.exception.code, 1)
+        # Оставшиеся обновления обработает перезапущенный процесс
+        self.assertEqual(self.queue.get_nowait()['update_id'], 2)
+
+    def test_exits_when_supervisor_is_gone(self):
+        patchers = [mock.patch.object(supervisor, 'PARENT_CHECK_INTERVAL', 0.01),
+                    mock.patch.object(supervisor, 'parent_alive', return_value=False)]
+        for patcher in patchers:
+            patcher.start()
+            self.addCleanup(patcher.stop)
+
+        for gated in (False, True):
+            with self.subTest(gated=gated), self.assertLogs('bot', 'ERROR'):
+                self.run_worker(gated=gated)
+        self.app.handle_update.assert_not_called()
+        self.assertEqual(self.app.close.call_count, 2)
+
+
+if __name__ == '__main__':
+    unittest.main()
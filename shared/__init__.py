@@ -0,0 +1,3 @@
+# shared/__init__.py
+#
+# Общий слой доступа к данным для бота и административной панели.
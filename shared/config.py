@@ -0,0 +1,22 @@
+# shared/config.py
+#
+# Общий источник настроек бота и админки: переменные окружения и файл .env
+# бота. Переменные, уже заданные в окружении, имеют приоритет над .env.
+
+from pathlib import Path
+
+ROOT_DIR = Path(__file__).resolve().parent.parent
+# Тот же порядок поиска, что у load_dotenv() в bot/: сначала bot/.env, затем
+# .env в корне репозитория
+ENV_FILES = (ROOT_DIR / 'bot' / '.env', ROOT_DIR / '.env')
+
+
+def load_env():
+    """Загружает первый найденный .env из ENV_FILES; возвращает его путь или None."""
+    from dotenv import load_dotenv
+
+    for path in ENV_FILES:
+        if path.is_file():
+            load_dotenv(path)
+            return path
+    return None
@@ -0,0 +1,63 @@
+# shared/dates.py
+#
+# Единые границы суток для статистики. Бот и админка считают день по
+# московскому времени: часовой пояс загружается один раз, а текущая дата
+# вычисляется заранее и переключается таймером в полночь по Москве.
+
+import threading
+import time as _time
+from datetime import datetime, time, timedelta
+
+from pytz import timezone
+
+MOSCOW_TZ = timezone('Europe/Moscow')
+
+
+def day_bounds(day, tz=MOSCOW_TZ):
+    """Начало и конец суток day в часовом поясе tz (aware datetime)."""
+    start = tz.localize(datetime.combine(day, time.min))
+    end = tz.localize(datetime.combine(day + timedelta(days=1), time.min))
+    return start, end
+
+
+class DayClock:
+    def __init__(self, tz=MOSCOW_TZ, clock=_time.time):
+        self.tz = tz
+        # Единый источник времени (секунды Unix): из него вычисляются и текущая
+        # дата, и момент окончания суток
+        self._clock = clock
+        self._lock = threading.Lock()
+        self._today = None
+        self._expires = 0.0
+        self._timer = None
+
+    def today(self):
+        # Таймер может опоздать (например, после приостановки процесса),
+        # поэтому дополнительно сверяемся с моментом окончания суток
+        if self._today is None or self._clock() >= self._expires:
+            self.rollover()
+        return self._today
+
+    def rollover(self):
+        with self._lock:
+            timestamp = self._clock()
+            self._today = datetime.fromtimestamp(timestamp, self.tz).date()
+            _, end = day_bounds(self._today, self.tz)
+            self._expires = end.timestamp()
+
+            if self._timer is not None:
+                self._timer.cancel()
+            # Таймер запускается при первом обращении, то есть уже в рабочем
+            # процессе, а не в родителе до fork
+            self._timer = threading.Timer(max(0.0, self._expires - timestamp), self.rollover)
+            self._timer.daemon = True
+            self._timer.start()
+
+    def stop(self):
+        with self._lock:
+            if self._timer is not None:
+                self._timer.cancel()
+                self._timer = None
+
+
+day_clock = DayClock()
@@ -0,0 +1,126 @@
+# shared/db.py
+#
+# Доступ к PostgreSQL для бота. Горячие запросы (поиск пользователя, запись
+# сообщения, обновление статистики) готовятся на сервере один раз на соединение,
+# поэтому PostgreSQL не разбирает и не планирует их заново на каждое сообщение.
+
+import os
+
+import psycopg2
+
+from shared import schema
+from shared.texts import STATIC_TEXTS, text_digest
+
+
+def database_config():
+    """Параметры подключения из переменных окружения, общие для бота и админки."""
+    return {
+        'dbname': os.getenv('DB_NAME'),
+        'user': os.getenv('DB_USER'),
+        'password': os.getenv('DB_PASSWORD'),
+        'host': os.getenv('DB_HOST'),
+        'port': os.getenv('DB_PORT'),
+    }
+
+
+class Database:
+    def __init__(self, config=None):
+        self.config = config or database_config()
+        self.conn = None
+        self.cursor = None
+        # Содержимое статического текста -> id строки в bot_texts
+        self.text_ids = {}
+
+    def connect(self):
+        return self.attach(psycopg2.connect(**self.config))
+
+    def attach(self, conn):
+        """Работа через уже открытое соединение psycopg2 (например, соединение Django)."""
+        self.conn = conn
+        self.cursor = self.conn.cursor()
+        self._prepare()
+        self.register_texts(STATIC_TEXTS)
+        return self
+
+    def close(self):
+        if self.conn is not None:
+            self.conn.close()
+        self.conn = None
+        self.cursor = None
+
+    def ping(self):
+        try:
+            self.cursor.execute("SELECT 1;")
+            return self.cursor.fetchone() == (1,)
+        finally:
+            self.conn.rollback()
+
+    def _prepare(self):
+        # Подготовленные запросы живут в рамках соединения, поэтому их нужно
+        # объявлять заново после каждого подключения
+        for name in schema.PREPARED:
+            self.cursor.execute(f"PREPARE {name} AS {schema.to_prepared(schema.STATEMENTS[name])};")
+        self.conn.commit()
+
+    def _execute(self, name, params):
+        if name in schema.PREPARED:
+            if params:
+                placeholders = ', '.join(['%s'] * len(params))
+                self.cursor.execute(f"EXECUTE {name} ({placeholders});", params)
+            else:
+                self.cursor.execute(f"EXECUTE {name};")
+        else:
+            self.cursor.execute(schema.STATEMENTS[name], params)
+
+    def _write(self, name, params):
+        try:
+            self._execute(name, params)
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def get_user(self, telegram_id):
+        """Возвращает (id, is_banned, last_subject) или None."""
+        try:
+            self._execute('get_user', (telegram_id,))
+            return self.cursor.fetchone()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def create_user(self, telegram_id, username, first_name, last_name):
+        try:
+            self._execute('create_user', (telegram_id, username, first_name, last_name))
+            user_db_id = self.cursor.fetchone()[0]
+            self.conn.commit()
+            return user_db_id
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def set_last_subject(self, user_db_id, subject):
+        self._write('set_last_subject', (subject, user_db_id))
+
+    def register_texts(self, texts):
+        try:
+            for key, content in texts.items():
+                digest = text_digest(content)
+                self._execute('insert_text', (key, digest, content))
+                self._execute('get_text', (digest,))
+                self.text_ids[content] = self.cursor.fetchone()[0]
+            self.conn.commit()
+        except Exception:
+            self.conn.rollback()
+            raise
+
+    def insert_message(self, user_db_id, role, content):
+        # Повторяющиеся тексты бота сохраняются ссылкой, а не полной копией
+        text_id = self.text_ids.get(content)
+        if text_id is not None:
+            content = ''
+        self._write('insert_message', (user_db_id, role, content, text_id))
+
+    def add_statistics(self, day, users=0, commands=0, messages=0):
+        # Один атомарный upsert вместо SELECT + UPDATE/INSERT
+        self._write('upsert_statistics', (day, users, commands, messages))
@@ -0,0 +1,81 @@
+# shared/schema.py
+#
+# Единое описание схемы базы данных. Таблицы создаются миграциями Django
+# (admin_panel/dashboard/models.py берёт отсюда имена таблиц), а бот
+# обращается к ним только через запросы, объявленные ниже.
+
+USERS_TABLE = 'users'
+MESSAGES_TABLE = 'messages'
+STATISTICS_TABLE = 'user_statistics'
+BOT_TEXTS_TABLE = 'bot_texts'
+
+# Колонки каждой таблицы в том виде, в котором их создаёт миграция
+TABLES = {
+    USERS_TABLE: (
+        'id', 'telegram_id', 'username', 'first_name', 'last_name',
+        'last_subject', 'is_paid', 'is_banned', 'start_date',
+    ),
+    MESSAGES_TABLE: ('id', 'user_id', 'role', 'content', 'text_id', 'timestamp'),
+    STATISTICS_TABLE: ('id', 'date', 'user_count', 'command_count', 'message_count'),
+    BOT_TEXTS_TABLE: ('id', 'key', 'digest', 'content'),
+}
+
+# Запросы бота. Параметры записываются в стиле DB-API (%s), чтобы один и тот же
+# текст можно было выполнить обычным курсором и подготовить через PREPARE.
+# Django не задаёт значения по умолчанию на уровне БД, поэтому флаги и даты
+# передаются явно.
+STATEMENTS = {
+    'get_user': f"""
+        SELECT id, is_banned, last_subject FROM {USERS_TABLE}
+        WHERE telegram_id = %s
+    """,
+    'create_user': f"""
+        INSERT INTO {USERS_TABLE}
+            (telegram_id, username, first_name, last_name, is_paid, is_banned, start_date)
+        VALUES (%s, %s, %s, %s, FALSE, FALSE, CURRENT_TIMESTAMP)
+        RETURNING id
+    """,
+    'set_last_subject': f"""
+        UPDATE {USERS_TABLE} SET last_subject = %s WHERE id = %s
+    """,
+    # Статические тексты бота хранятся один раз в bot_texts, а сообщение
+    # ссылается на них через text_id с пустым content. Строки bot_texts
+    # неизменяемы: изменённый текст получает новую строку с другим digest,
+    # поэтому старые сообщения сохраняют текст, который был отправлен
+    'insert_message': f"""
+        INSERT INTO {MESSAGES_TABLE} (user_id, role, content, text_id, timestamp)
+        VALUES (%s, %s, %s, %s, CURRENT_TIMESTAMP)
+    """,
+    'insert_text': f"""
+        INSERT INTO {BOT_TEXTS_TABLE} (key, digest, content)
+        VALUES (%s, %s, %s)
+        ON CONFLICT (digest) DO NOTHING
+    """,
+    'get_text': f"""
+        SELECT id FROM {BOT_TEXTS_TABLE} WHERE digest = %s
+    """,
+    'upsert_statistics': f"""
+        INSERT INTO {STATISTICS_TABLE} (date, user_count, command_count, message_count)
+        VALUES (%s, %s, %s, %s)
+        ON CONFLICT (date) DO UPDATE SET
+            user_count = {STATISTICS_TABLE}.user_count + EXCLUDED.user_count,
+            command_count = {STATISTICS_TABLE}.command_count + EXCLUDED.command_count,
+            message_count = {STATISTICS_TABLE}.message_count + EXCLUDED.message_count
+    """,
+}
+
+# Запросы, которые выполняются на каждое сообщение и потому готовятся на сервере
+PREPARED = ('get_user', 'insert_message', 'upsert_statistics')
+
+
+def to_prepared(sql):
+    """Заменяет плейсхолдеры %s на позиционные $1, $2, ... для PREPARE."""
+    parts = sql.split('%s')
+    result = parts[0]
+    for number, part in enumerate(parts[1:], start=1):
+        result += f'${number}' + part
+    return result
+
+
+def placeholder_count(sql):
+    return sql.count('%s')
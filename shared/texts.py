@@ -0,0 +1,46 @@
+# shared/texts.py
+#
+# Статические тексты бота. Бот регистрирует их в таблице bot_texts при
+# подключении, а в истории сообщений хранит только ссылку на текст.
+
+import hashlib
+
+
+def text_digest(content):
+    """SHA-256 текста: по нему строки bot_texts ищутся и никогда не изменяются."""
+    return hashlib.sha256(content.encode('utf-8')).hexdigest()
+
+
+TERMS_ACCEPTED_TEXT = (
+    "Дорогой ученик, перед тобой виртуальный помощник образования. "
+    "Чтобы ознакомиться с моими возможностями, нажми на кнопку «Меню»."
+)
+
+FAQ_TEXT = """1) Говори точно, что именно тебе нужно:
+    Например, вместо «Помоги с математикой», лучше сказать «Как решить пример: 3 умножить на 2?». Это поможет мне точно понять, что именно тебе нужно.
+    2) Задавай по одному вопросу:
+    Если хочешь узнать не только о животных, но и о том, как решать математические примеры, лучше спросить сначала одно, а потом другое. Например, сначала спроси «Что едят зайцы?» и после ответа спроси «Как сложить 5 и 3?»
+    3) Проверяй, что написал/-а:
+    Если пишешь пример или вопрос, убедись, что в нём нет орфографических ошибок. Например, если хочешь спросить про «5 умножить на 2», не пиши «5 ужножить на 2», потому что я могу не понять вопрос.
+    4) Спрашивай, если что-то непонятно:
+    Если я объяснила, как решить пример, и тебе что-то непонятно, спроси меня еще раз. Например, я уже рассказала информацию на тему: «Что едят зайцы?», а ты хочешь узнать подробности. Тогда спроси меня, к примеру, «А что именно едят зайцы весной?»
+    5) Задавай мне много вопросов:
+    Я всегда рада ответить на любой твой вопрос. Задавай интересующие вопросы снова и снова, ведь учиться – это очень интересно!"""
+
+FEEDBACK_TEXT = """У тебя появились вопросы, пожелания, или ты заметил/-а какую-то ошибку? Давай вместе улучшим Эврику!
+Напиши нам на почту:
+evrika@hss.center"""
+
+HELP_TEXT = """Список доступных команд:
+/start - Начать работу с ботом
+/faq - Как со мной общаться?
+/subject - Выбрать предмет
+/feedback - Обратная связь
+/help - Список команд"""
+
+STATIC_TEXTS = {
+    'terms_accepted': TERMS_ACCEPTED_TEXT,
+    'faq': FAQ_TEXT,
+    'feedback': FEEDBACK_TEXT,
+    'help': HELP_TEXT,
+}